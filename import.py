@@ -1,16 +1,19 @@
 #!/usr/bin/env python3
 import argparse
 import collections
+import concurrent.futures
 import csv
 import datetime
-import io
+import glob
 import numpy as np
 import os
 import pandas as pd
 from pathlib import Path
 import pickle
 import requests
+import shutil
 import sys
+import threading
 
 from util.csv import csv_as_dicts
 import util.date as ud
@@ -37,13 +40,14 @@ parser.add_argument("--JHU_url_format", default=(
 parser.add_argument('--JHU_data_dir', default='downloads/JHU')
 parser.add_argument('--output_csvs', action='store_true')
 parser.add_argument('--print_renames', action='store_true')
+parser.add_argument('--verbose', action='store_true')
 args = parser.parse_args()
 
 
 # --------------------------------------------------------------------------------
 # Funtions which fetch data from JHU's github and our spreadsheets.
 
-def fetch(source_url, dest_file, cache=False, verbose=True, encoding=None):
+def fetch(source_url, dest_file, cache=False, verbose=True):
     if os.path.exists(dest_file):
         if isinstance(cache, datetime.timedelta):
             last_modified = datetime.datetime.fromtimestamp(os.path.getmtime(dest_file))
@@ -59,45 +63,112 @@ def fetch(source_url, dest_file, cache=False, verbose=True, encoding=None):
     if download:
         if verbose:
             print(f'Downloading: {source_url} ---> {dest_file}')
-        r = requests.get(source_url)
-        if encoding: r.encoding = encoding
-        r.raise_for_status()
-        open(dest_file, 'w').write(r.text)
-        return r.text
-    else:
-        return open(dest_file).read()
+        # Stream the raw bytes to disk, via a temporary file so an interrupted
+        # download never looks like a cached one.
+        part_file = dest_file + '.part'
+        with requests.get(source_url, stream=True) as r:
+            r.raise_for_status()
+            r.raw.decode_content = True  # Undo any gzip transfer encoding.
+            with open(part_file, 'wb') as f:
+                shutil.copyfileobj(r.raw, f)
+        os.replace(part_file, dest_file)
+    return dest_file
 
 
 def fetch_raw_jhu_data(dates):
-    jhu_data = {}
-    for date in dates:
+    def fetch_one(date):
         url = date.strftime(args.JHU_url_format)
         file_path = os.path.join(args.JHU_data_dir, date.isoformat() + ".csv")
-        try:
-            fetch(url, file_path, cache=True)
-        except requests.exceptions.HTTPError as e:
-            print(f"Couldn't fetch: {url}")
-            print(f"The fetch failed with code {e.response.status_code}: {e.response.reason}")
-            if e.response.status_code == 404:
-                print(f"It seems JHU has not yet published the data for {date.isoformat()}.")
-            sys.exit(1)
-        jhu_data[date] = csv_as_dicts(open(file_path, encoding='utf-8-sig'))
-        # Note: utf-8-sig gets rid of unicode byte order mark characters.
+        fetch(url, file_path, cache=True, verbose=args.verbose)
+        return file_path
+
+    # The downloads are independent and latency bound, so keep many in flight.
+    jhu_data = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=16)
+    try:
+        futures = [(date, executor.submit(fetch_one, date)) for date in dates]
+        for date, future in futures:
+            try:
+                file_path = future.result()
+            except requests.exceptions.HTTPError as e:
+                print(f"Couldn't fetch: {e.request.url}")
+                print(f"The fetch failed with code {e.response.status_code}: {e.response.reason}")
+                if e.response.status_code == 404:
+                    print(f"It seems JHU has not yet published the data for {date.isoformat()}.")
+                sys.exit(1)
+            jhu_data[date] = load_jhu_csv(file_path)
+    finally:
+        # On any failure, drop the queued downloads rather than waiting for them.
+        executor.shutdown(wait=False, cancel_futures=True)
     return jhu_data
 
 
+# The JHU columns we use.  Some were renamed partway through the pandemic.
+JHU_COLUMN_TYPES = {
+    'Country_Region': str, 'Country/Region': str,
+    'Province_State': str, 'Province/State': str,
+    'Admin2': str,
+    'Lat': str, 'Latitude': str,
+    'Long_': str, 'Longitude': str,
+    'Confirmed': 'Int64', 'Deaths': 'Int64', 'Recovered': 'Int64'}
+JHU_COLUMN_RENAMES = {
+    'Country/Region': 'Country_Region',
+    'Province/State': 'Province_State',
+    'Latitude': 'Lat',
+    'Longitude': 'Long_'}
+
+# Bump this whenever load_jhu_csv's parsing changes, so old pickles get ignored.
+JHU_CACHE_VERSION = 3
+
+def load_jhu_csv(file_path):
+    """Parse a JHU daily report into a DataFrame with uniform column names,
+    reusing a pickle of it if it's up to date."""
+    cache_path = f'{file_path}.v{JHU_CACHE_VERSION}.pkl'
+    if (os.path.exists(cache_path) and
+            os.path.getmtime(cache_path) >= os.path.getmtime(file_path)):
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            # E.g. a pickle written by a different pandas version.  Just re-parse.
+            print(f"Ignoring unreadable cache {cache_path}: {e}")
+    # Note: utf-8-sig gets rid of unicode byte order mark characters.
+    # Only empty cells count as missing, so names like "None" or "NA" survive as written.
+    frame = pd.read_csv(file_path, encoding='utf-8-sig', engine='c',
+            usecols=lambda c: c in JHU_COLUMN_TYPES, dtype=JHU_COLUMN_TYPES,
+            keep_default_na=False, na_values=[''])
+    frame = frame.rename(columns=JHU_COLUMN_RENAMES)
+    for c in ['Country_Region', 'Province_State', 'Admin2']:
+        frame[c] = frame[c].fillna('') if c in frame else ''
+    # Blank coordinates are kept as '', but a file without the column gets None.
+    for c in ['Lat', 'Long_']:
+        frame[c] = frame[c].fillna('') if c in frame else None
+    for c in ['Confirmed', 'Deaths', 'Recovered']:
+        frame[c] = frame[c].fillna(0).astype(int) if c in frame else 0
+    # Write via a temporary file so a killed run can't leave a truncated cache,
+    # then clear out caches left by older versions of this function.
+    part_path = cache_path + '.part'
+    with open(part_path, 'wb') as f:
+        pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(part_path, cache_path)
+    for old_path in glob.glob(glob.escape(file_path) + '*.pkl'):
+        if old_path != cache_path: os.remove(old_path)
+    return frame
+
+
 def fetch_population_data():
     """Download c19map.org's population data."""
     csv_url = args.sheets_csv_fetcher.format(
         doc=args.population_doc, sheet=args.population_sheet)
-    csv_str = fetch(csv_url, 'downloads/population.csv', cache=datetime.timedelta(hours=1))
-    csv_source = csv_as_dicts(io.StringIO(csv_str))
+    csv_path = fetch(csv_url, 'downloads/population.csv',
+            cache=datetime.timedelta(hours=1), verbose=args.verbose)
     populations = {}
-    for row in csv_source:
-        country = row["Country/Region"]
-        province = row["Province/State"]
-        key = (country, province, '')
-        populations[key] = int(row["Population"].replace(',', ''))
+    with open(csv_path, encoding='utf-8-sig') as f:
+        for row in csv_as_dicts(f):
+            country = row["Country/Region"]
+            province = row["Province/State"]
+            key = (country, province, '')
+            populations[key] = int(row["Population"].replace(',', ''))
     return populations
 
 
@@ -105,9 +176,13 @@ def fetch_intervention_data():
     """Download c19map.org's intervention data."""
     csv_url = args.sheets_csv_fetcher.format(
         doc=args.interventions_doc, sheet=args.interventions_sheet)
-    csv_str = fetch(csv_url, 'downloads/interventions.csv', cache=datetime.timedelta(hours=1))
-    csv_source = csv_as_dicts(io.StringIO(csv_str))
-    date_cols = [(ud.parse_date(s), s) for s in csv_source.headers()]
+    csv_path = fetch(csv_url, 'downloads/interventions.csv',
+            cache=datetime.timedelta(hours=1), verbose=args.verbose)
+    with open(csv_path, encoding='utf-8-sig') as f:
+        csv_source = csv_as_dicts(f)
+        headers = csv_source.headers()
+        rows = list(csv_source)
+    date_cols = [(ud.parse_date(s), s) for s in headers]
     date_cols = sorted((d, s) for d, s in date_cols if d is not None)
     for d, d2 in zip(date_cols, date_cols[1:]):
         assert (d2[0]-d[0]).days == 1, "Dates must be consecutive.  Did a column get deleted?"
@@ -115,7 +190,7 @@ def fetch_intervention_data():
     unknown = TimeSeries(start_date, ['Unknown']*len(date_cols))
 
     interventions = {}
-    for row in csv_source:
+    for row in rows:
         place = (row['Country/Region'], row['Province/State'], '')
         assert place not in interventions, f"Duplicate row for place {place}"
         intervention_list = []
@@ -133,12 +208,12 @@ def fetch_intervention_data():
 
 def fetch_google_mobility_data():
     frame_by_place = {}
-    csv_str = fetch(
+    csv_path = fetch(
             'https://www.gstatic.com/covid19/mobility/Global_Mobility_Report.csv',
             'downloads/google_mobility.csv', cache=datetime.timedelta(hours=1),
-            encoding='utf-8')
+            verbose=args.verbose)
     region_cols = ['country_region','sub_region_1','sub_region_2']
-    entire_frame = pd.read_csv(io.StringIO(csv_str), dtype={
+    entire_frame = pd.read_csv(csv_path, dtype={
         'country_region_code': 'object',
         'country_region': 'object',
         'sub_region_1': 'object',
@@ -173,17 +248,30 @@ def fetch_google_mobility_data():
 # Load our inputs:
 
 dates = ud.date_range_inclusive(args.start, args.last)
+def in_background(f):
+    """Run f on a daemon thread, returning a Future for its result.  Unlike an
+    executor's workers, the thread won't hold up exiting if we bail out early."""
+    future = concurrent.futures.Future()
+    def run():
+        try: future.set_result(f())
+        except BaseException as e: future.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+# The sources are independent, so fetch the other three while JHU's downloads run.
+population_future = in_background(fetch_population_data)
+interventions_future = in_background(fetch_intervention_data)
+google_mobility_future = in_background(fetch_google_mobility_data)
 raw_jhu_data = fetch_raw_jhu_data(dates)
-population = fetch_population_data()
-interventions, intervention_unknown = fetch_intervention_data()
+population = population_future.result()
+interventions, intervention_unknown = interventions_future.result()
+google_mobility = google_mobility_future.result()
 intervention_dates = intervention_unknown.dates()
-google_mobility = fetch_google_mobility_data()
 
 
 # --------------------------------------------------------------------------------
 # Reconcile the data together into one `Place` object for each region.
 recon = PlaceRecon()
-places = {}
 populations_recorded = set()
 interventions_recorded = set()
 unknown_interventions_places = set()
@@ -192,41 +280,21 @@ unknown_google_mobility = set()
 
 # First reconcile the auxiliary data:
 def canonicalize_map(original, name):
-    processed = {}
-    back_map = {}
+    buckets = collections.defaultdict(list)
     for old_k,v in sorted(original.items()):
-        k = recon.canonicalize(old_k)
-        if k in processed:
-            print(f"Warning: duplicate {name} entries for {k}: {old_k} and {back_map[k]}")
-            continue
-        back_map[k] = old_k
-        processed[k] = v
+        buckets[recon.canonicalize(old_k)].append((old_k, v))
+    processed = {}
+    for k, entries in buckets.items():
+        if len(entries) > 1:
+            old_ks = ', '.join(str(old_k) for old_k, _ in entries)
+            print(f"Warning: duplicate {name} entries for {k}: {old_ks}")
+        processed[k] = entries[0][1]
     return processed
 
 population = canonicalize_map(population, 'population')
 interventions = canonicalize_map(interventions, 'interventions')
 google_mobility = canonicalize_map(google_mobility, 'google_mobility')
 
-def create_place(p):
-    places[p] = Place(dates)
-    places[p].set_key(p)
-    if p in population:
-        places[p].population = population[p]
-        populations_recorded.add(p)
-    if p in interventions:
-        places[p].interventions = interventions[p]
-        interventions_recorded.add(p)
-    else:
-        places[p].interventions = intervention_unknown
-        unknown_interventions_places.add(p)
-    if p in google_mobility:
-        places[p].google_mobility = google_mobility[p]
-        google_mobility_recorded.add(p)
-    else:
-        places[p].google_mobility = None
-        unknown_google_mobility.add(p)
-
-
 
 throw_away_places = set([
     ('US', 'US', ''), ('Australia', '', ''),
@@ -234,90 +302,131 @@ throw_away_places = set([
     ('US', 'Recovered', ''),
     ])
 
-def first_present(d, ks):
-    for k in ks:
-        if k in d: return d[k]
-    return None
-
-for date, row_source in raw_jhu_data.items():
-    for keyed_row in row_source:
-        country = first_present(keyed_row, ['Country_Region', 'Country/Region'])
-        province = first_present(keyed_row, ['Province_State', 'Province/State'])
-        district = first_present(keyed_row, ['Admin2']) or ''
-        latitude = first_present(keyed_row, ['Lat', 'Latitude'])
-        longitude = first_present(keyed_row, ['Long_', 'Longitude'])
-        confirmed = first_present(keyed_row, ['Confirmed'])
-        deaths = first_present(keyed_row, ['Deaths'])
-        recovered = first_present(keyed_row, ['Recovered'])
-
-        p = (country, province, district)
-        if p in throw_away_places: continue
-        if recon.is_ship(p): continue
-        p = recon.canonicalize(p)
-
-        if p not in places: create_place(p)
-
-        if latitude is not None and longitude is not None:
-            places[p].latitude = latitude
-            places[p].longitude = longitude
-        places[p].update('confirmed', date, confirmed)
-        places[p].update('deaths', date, deaths)
-        places[p].update('recovered', date, recovered)
+# Countries whose county data we consolidate into provinces/states:
+PROVINCE_LEVEL_COUNTRIES = ["United States", "Canada"]
+
+# Countries whose provincial data we consolidate into the whole country:
+COUNTRY_LEVEL_COUNTRIES = [
+    "Brazil", "Chile", "Colombia", "Germany", "Italy", "Japan",
+    "Mexico", "Peru", "Russia", "Spain", "Sweden", "Ukraine"]
+
+# The JHU numbers go into one (place x date) matrix per series.  Each place gets
+# a row the first time we see it (or need it as a consolidation target.)
+place_to_idx = {}
+place_keys = []
+def place_index(p):
+    idx = place_to_idx.get(p)
+    if idx is None:
+        idx = place_to_idx[p] = len(place_keys)
+        place_keys.append(p)
+    return idx
+
+def consolidated_key(p):
+    """The place whose totals p's numbers get added into."""
+    if p[0] in PROVINCE_LEVEL_COUNTRIES and p[2] != '':
+        return (p[0], p[1], '')
+    if p[0] in COUNTRY_LEVEL_COUNTRIES and p[1] != '':
+        return (p[0], '', '')
+    return p
+
+def jhu_place_index(raw_p):
+    """The row for a place as JHU spells it, or -1 if we don't track it."""
+    if raw_p in throw_away_places: return -1
+    if recon.is_ship(raw_p): return -1
+    p = recon.canonicalize(raw_p)
+    place_index(consolidated_key(p))
+    return place_index(p)
+
+# The same raw keys recur every day, so we resolve each one to a row just once.
+raw_place_to_idx = {}
+def raw_place_index(raw_p):
+    idx = raw_place_to_idx.get(raw_p)
+    if idx is None:
+        idx = raw_place_to_idx[raw_p] = jhu_place_index(raw_p)
+    return idx
+
+date_to_idx = {d: i for i, d in enumerate(dates)}
+coordinates = {}
+place_idxs, date_idxs = [], []
+confirmed_vals, deaths_vals, recovered_vals = [], [], []
+
+for date, frame in raw_jhu_data.items():
+    raw_keys = list(zip(frame['Country_Region'], frame['Province_State'], frame['Admin2']))
+    # Usually every key is already known: then it's one dict probe per row, all in C.
+    idxs = list(map(raw_place_to_idx.get, raw_keys))
+    if None in idxs:
+        idxs = [raw_place_index(p) for p in raw_keys]
+    idxs = np.array(idxs, dtype=int)
+
+    # Only the rows we keep need the rest of their columns.
+    keep = idxs >= 0
+    if not keep.all():
+        frame = frame.loc[keep, ['Lat', 'Long_', 'Confirmed', 'Deaths', 'Recovered']]
+        idxs = idxs[keep]
+
+    # Each place keeps the coordinates from its last row, even if they're blank.
+    located = (frame['Lat'].notna() & frame['Long_'].notna()).to_numpy()
+    coordinates.update(zip(idxs[located].tolist(),
+        zip(frame['Lat'][located], frame['Long_'][located])))
+    place_idxs.append(idxs)
+    date_idxs.append(np.full(len(idxs), date_to_idx[date]))
+    confirmed_vals.append(frame['Confirmed'].to_numpy())
+    deaths_vals.append(frame['Deaths'].to_numpy())
+    recovered_vals.append(frame['Recovered'].to_numpy())
+
+place_idxs = np.concatenate(place_idxs)
+date_idxs = np.concatenate(date_idxs)
+
+# Where JHU has several rows for the same place and day, keep the largest.
+def count_matrix(vals):
+    m = np.zeros((len(place_keys), len(dates)), dtype=int)
+    np.maximum.at(m, (place_idxs, date_idxs), vals)
+    return m
+
+confirmed = count_matrix(np.concatenate(confirmed_vals))
+deaths = count_matrix(np.concatenate(deaths_vals))
+recovered = count_matrix(np.concatenate(recovered_vals))
+present = np.zeros(len(place_keys), dtype=bool)
+present[place_idxs] = True
 
 
 # --------------------------------------------------------------------------------
 # Edits to the data to fix various artefacts and glitches.
 
-# Consolidate county data into provinces/states:
-def consolidate_to_province_level(country):
-    for p in sorted(places.keys()):
-        if p[0] == country and p[2] != '':
-            state = (p[0], p[1], '')
-            if state not in places:
-                create_place(state)
-            places[state].confirmed += places[p].confirmed
-            places[state].deaths += places[p].deaths
-            places[state].recovered += places[p].recovered
-            del places[p]  # Avoid double-counting.
-
-consolidate_to_province_level("United States")
-consolidate_to_province_level("Canada")
-
-def consolidate_to_country_level(country):
-    target = places[(country, '', '')]
-    for p in sorted(places.keys()):
-        if p[0] == country and p[1] != '':
-            target.confirmed += places[p].confirmed
-            target.deaths += places[p].deaths
-            target.recovered += places[p].recovered
-            del places[p]
-
-
-consolidate_to_country_level("Brazil")
-consolidate_to_country_level("Chile")
-consolidate_to_country_level("Colombia")
-consolidate_to_country_level("Germany")
-consolidate_to_country_level("Italy")
-consolidate_to_country_level("Japan")
-consolidate_to_country_level("Mexico")
-consolidate_to_country_level("Peru")
-consolidate_to_country_level("Russia")
-consolidate_to_country_level("Spain")
-consolidate_to_country_level("Sweden")
-consolidate_to_country_level("Ukraine")
+# Consolidate county data into provinces/states, and some countries' provincial
+# data into the whole country.  This is one pass adding each row into its target's.
+group_idx = np.array([place_to_idx[consolidated_key(p)] for p in place_keys], dtype=int)
+
+def consolidate(m):
+    total = np.zeros_like(m)
+    np.add.at(total, group_idx, m)
+    return total
+
+confirmed = consolidate(confirmed)
+deaths = consolidate(deaths)
+recovered = consolidate(recovered)
+consolidated_present = np.zeros_like(present)
+consolidated_present[group_idx[present]] = True
+present = consolidated_present
 
 
 # Fix the fact that France was recorded as French Polynesia on March 23rd:
-def correct_misrecorded_place(d, correct_p, recorded_p):
-    correct = places[correct_p]
-    recorded = places[recorded_p]
+# These fixes need the day in question and the day before it; skip them if
+# either falls outside the dates we're importing.
+def correction_date_positions(d):
     prev_d = d - datetime.timedelta(1)
-    correct.confirmed[d] = recorded.confirmed[d]
-    correct.deaths[d] = recorded.deaths[d]
-    correct.recovered[d] = recorded.recovered[d]
-    recorded.confirmed[d] = recorded.confirmed[prev_d]
-    recorded.deaths[d] = recorded.deaths[prev_d]
-    recorded.recovered[d] = recorded.recovered[prev_d]
+    if d not in date_to_idx or prev_d not in date_to_idx: return None
+    return date_to_idx[d], date_to_idx[prev_d]
+
+def correct_misrecorded_place(d, correct_p, recorded_p):
+    positions = correction_date_positions(d)
+    if positions is None: return
+    date_idx, prev_date_idx = positions
+    correct_idx = place_to_idx[correct_p]
+    recorded_idx = place_to_idx[recorded_p]
+    for m in [confirmed, deaths, recovered]:
+        m[correct_idx, date_idx] = m[recorded_idx, date_idx]
+        m[recorded_idx, date_idx] = m[recorded_idx, prev_date_idx]
 
 correct_misrecorded_place(
         datetime.date(2020, 3, 23),
@@ -326,16 +435,47 @@ correct_misrecorded_place(
 # Hubei China suddenly increased their reported deaths on April 17th.
 # Until we get better data from before then, we'll scale everything before that date up.
 def correct_late_reporting(p, d):
-    place = places[p]
-    prev_d = d - datetime.timedelta(1)
-    scaling_factor = place.deaths[d]/place.deaths[prev_d]
-    pos = place.deaths.date_to_position(d)
-    new_deaths = place.deaths.array()[:pos] * scaling_factor
-    place.deaths.array()[:pos] = new_deaths.astype(int)
+    positions = correction_date_positions(d)
+    if positions is None: return
+    pos, prev_pos = positions
+    idx = place_to_idx[p]
+    scaling_factor = deaths[idx, pos]/deaths[idx, prev_pos]
+    # Scale in place; the unsafe cast truncates back to whole deaths like astype(int) did.
+    np.multiply(deaths[idx, :pos], scaling_factor, out=deaths[idx, :pos], casting='unsafe')
 
 correct_late_reporting(('China', 'Hubei', ''), datetime.date(2020, 4, 17))
 
 
+# --------------------------------------------------------------------------------
+# Wrap up each remaining row of the matrices as a `Place`.
+
+def create_place(p, idx):
+    place = Place(dates, confirmed[idx], deaths[idx], recovered[idx])
+    place.set_key(p)
+    if idx in coordinates:
+        place.latitude, place.longitude = coordinates[idx]
+    if p in population:
+        place.population = population[p]
+        populations_recorded.add(p)
+    if p in interventions:
+        place.interventions = interventions[p]
+        interventions_recorded.add(p)
+    else:
+        place.interventions = intervention_unknown
+        unknown_interventions_places.add(p)
+    if p in google_mobility:
+        place.google_mobility = google_mobility[p]
+        google_mobility_recorded.add(p)
+    else:
+        place.google_mobility = None
+        unknown_google_mobility.add(p)
+    return place
+
+places = {place_keys[idx]: create_place(place_keys[idx], idx)
+        for idx in np.flatnonzero(present)}
+sorted_place_keys = sorted(places.keys())
+
+
 # --------------------------------------------------------------------------------
 # Warnings for catching missing data, etc.
 
@@ -355,17 +495,17 @@ print()
 
 if args.print_renames:
     print('RENAMES:')
-    for src, trg in sorted(recon.place_cache.items()):
-        print(f"{src} --> {trg}")
+    sys.stdout.write(''.join(
+        f"{src} --> {trg}\n" for src, trg in sorted(recon.place_cache.items())))
     print()
 
-for k, p in sorted(places.items()):
-    if p.population is None and k not in SILENCE_POPULATION_WARNINGS:
+for k in sorted_place_keys:
+    if places[k].population is None and k not in SILENCE_POPULATION_WARNINGS:
         print("No Population Data: ", k)
 
 print()
-for k, p in sorted(places.items()):
-    if p.interventions is intervention_unknown:
+for k in sorted_place_keys:
+    if places[k].interventions is intervention_unknown:
         print("No Intervention Data: ", k)
 
 print()
@@ -374,11 +514,12 @@ for k in sorted(interventions.keys()):
         print("Lost intervention data for: ", k)
 
 print()
-for k in sorted(google_mobility.keys()):
+sorted_google_mobility_keys = sorted(google_mobility.keys())
+for k in sorted_google_mobility_keys:
     if k not in google_mobility_recorded and k[1] == '':
         print("Lost country-level google mobility data for: ", k)
 
-for k in sorted(google_mobility.keys()):
+for k in sorted_google_mobility_keys:
     if (k not in google_mobility_recorded and
             k[0] in ["United States", "Canada", "Australia"] and
             k[1] != '' and k[2] == ''):
@@ -389,28 +530,32 @@ for k in sorted(google_mobility.keys()):
 # Output Data.
 
 with open('places.pkl', 'wb') as pickle_f:
-    pickle.dump(places, pickle_f)
+    pickle.dump(places, pickle_f, protocol=pickle.HIGHEST_PROTOCOL)
 
 if args.output_csvs:
-    confirmed_out = csv.writer(open("time_series_confirmed.csv", 'w'))
-    deaths_out = csv.writer(open("time_series_deaths.csv", 'w'))
-    recovered_out = csv.writer(open("time_series_recovered.csv", 'w'))
-
     headers = ["Province/State","Country/Region","Lat","Long"]
     headers += [d.strftime("%m/%d/%y") for d in dates]
-    confirmed_out.writerow(headers)
-    deaths_out.writerow(headers)
-    recovered_out.writerow(headers)
 
-    for p in sorted(places.keys()):
+    output_idxs = []
+    row_starts = []
+    for p in sorted_place_keys:
         country, province, district = p
         if district: continue
-        if sum(places[p].confirmed) == 0: continue  #Skip if no data.
+        idx = place_to_idx[p]
+        if confirmed[idx].sum() == 0: continue  #Skip if no data.
 
         latitude = places[p].latitude or ''
         longitude = places[p].longitude or ''
-        row_start = [province, country, latitude, longitude]
-        confirmed_out.writerow(row_start + list(places[p].confirmed))
-        deaths_out.writerow(row_start + list(places[p].deaths))
-        recovered_out.writerow(row_start + list(places[p].recovered))
-
+        output_idxs.append(idx)
+        row_starts.append([province, country, latitude, longitude])
+
+    def write_time_series(file_name, m):
+        with open(file_name, 'w') as f:
+            out = csv.writer(f)
+            out.writerow(headers)
+            out.writerows(row_start + row
+                    for row_start, row in zip(row_starts, m[output_idxs].tolist()))
+
+    write_time_series("time_series_confirmed.csv", confirmed)
+    write_time_series("time_series_deaths.csv", deaths)
+    write_time_series("time_series_recovered.csv", recovered)
@@ -1,6 +1,7 @@
 import argparse
 import datetime
 import dateutil.parser
+import functools
 
 
 def parse_date(s):
@@ -8,6 +9,12 @@ def parse_date(s):
     if s == "today": return datetime.date.today()
     elif s == "yesterday": return datetime.date.today() - datetime.timedelta(1)
     elif s == "tomorrow": return datetime.date.today() + datetime.timedelta(1)
+    return parse_absolute_date(s)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_absolute_date(s):
+    """Parses non-relative dates.  Memoized, since the same strings recur a lot."""
     try: return dateutil.parser.parse(s).date()
     except ValueError: return None
 
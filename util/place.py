@@ -10,7 +10,7 @@ class Place:
     - Population, latitude, and longitude.
     - Intervention time series.
     """
-    def __init__(self, dates):
+    def __init__(self, dates, confirmed=None, deaths=None, recovered=None):
         self.country = None
         self.province = None
         self.district = None
@@ -18,9 +18,13 @@ class Place:
         self.longitude = None
         self.population = None
 
-        self.confirmed = TimeSeries(dates[0], np.zeros(len(dates), dtype=int))
-        self.deaths = TimeSeries(dates[0], np.zeros(len(dates), dtype=int))
-        self.recovered =  TimeSeries(dates[0], np.zeros(len(dates), dtype=int))
+        # The arrays may be passed in (e.g. as rows of a larger matrix.)
+        def series(a):
+            if a is None: a = np.zeros(len(dates), dtype=int)
+            return TimeSeries(dates[0], a)
+        self.confirmed = series(confirmed)
+        self.deaths = series(deaths)
+        self.recovered = series(recovered)
 
         self.interventions = None
         self.google_mobility = None
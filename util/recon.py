@@ -1,6 +1,7 @@
 import country_converter as coco
 import logging
 import os
+import sys
 
 from util.csv import csv_as_dicts
 
@@ -89,5 +90,8 @@ class PlaceRecon:
             if len(a) == 2:
                 province = self.code_to_ca_province.get(a[1], a[1])
                 p = (p[0], province, a[0])
+
+        # The same few thousand names recur constantly, so share one copy of each.
+        p = tuple(map(sys.intern, p))
         self.place_cache[old_p] = p
         return p